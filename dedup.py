@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+from PIL import Image
+import profiler
+
+# dHash: compare neighbouring pixels of a (HASH_SIZE x HASH_SIZE+1) thumbnail
+HASH_SIZE = 8
+
+
+def _hash_thumbnail(path):
+    """Returns ((width, height), small_gray) or None if the file can't be read."""
+    try:
+        with Image.open(path) as im:
+            size = im.size
+            # draft() lets the JPEG decoder downscale in the DCT domain
+            im.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+            small = im.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+            return size, np.asarray(small, dtype=np.int16)
+    except Exception as e:
+        print(f"Could not hash {path}: {e}")
+        return None
+
+
+def perceptual_hashes(paths):
+    """
+    Computes difference hashes for a list of image files.
+    Returns (sizes, hashes, readable):
+      sizes: list of (width, height), None for unreadable files
+      hashes: (N, HASH_SIZE*HASH_SIZE/8) uint8 array of packed hash bits
+      readable: (N,) bool array
+    """
+    with profiler.span("perceptual_hashes", files=len(paths)):
+        return _perceptual_hashes(paths)
+
+
+def _perceptual_hashes(paths):
+    n = len(paths)
+    sizes = [None] * n
+    thumbs = np.zeros((n, HASH_SIZE, HASH_SIZE + 1), dtype=np.int16)
+    readable = np.zeros(n, dtype=bool)
+
+    for i, path in enumerate(paths):
+        result = _hash_thumbnail(path)
+        if result is None:
+            continue
+        sizes[i], thumbs[i] = result
+        readable[i] = True
+
+    # All hashes at once: one bit per horizontal gradient sign
+    bits = thumbs[:, :, 1:] > thumbs[:, :, :-1]
+    hashes = np.packbits(bits.reshape(n, HASH_SIZE * HASH_SIZE), axis=1)
+    return sizes, hashes, readable
+
+
+def hamming_distances(hash_row, hashes):
+    """Hamming distance between one packed hash and every row of `hashes`."""
+    return np.unpackbits(np.bitwise_xor(hashes, hash_row), axis=1).sum(axis=1)
+
+
+def find_near_duplicates(paths, max_distance=4):
+    """
+    Groups files into clusters of near-duplicate images with identical dimensions.
+    Returns a list of clusters (lists of paths) in input order. The first path of
+    each cluster is its representative. Unreadable files end up in their own cluster.
+    """
+    sizes, hashes, readable = perceptual_hashes(paths)
+
+    by_size = {}
+    for i, size in enumerate(sizes):
+        if readable[i]:
+            by_size.setdefault(size, []).append(i)
+
+    cluster_of = {}
+    clusters = []
+    for idx in by_size.values():
+        idx = np.array(idx)
+        group_hashes = hashes[idx]
+        unassigned = np.ones(len(idx), dtype=bool)
+
+        for k in range(len(idx)):
+            if not unassigned[k]:
+                continue
+            # Leader clustering: everything close to the first unassigned hash joins it
+            close = (hamming_distances(group_hashes[k], group_hashes) <= max_distance) & unassigned
+            unassigned &= ~close
+            members = [int(i) for i in idx[close]]
+            cluster_of[members[0]] = len(clusters)
+            clusters.append(members)
+
+    # Restore input order, keeping unreadable files as singletons
+    ordered = []
+    for i in range(len(paths)):
+        if i in cluster_of:
+            ordered.append([paths[j] for j in clusters[cluster_of[i]]])
+        elif not readable[i]:
+            ordered.append([paths[i]])
+    return ordered
+
+
+def _mask_window(mask, margin):
+    h, w = mask.shape
+    x1, y1, x2, y2 = mask.bbox()
+    return max(0, x1 - margin), max(0, y1 - margin), min(w, x2 + margin), min(h, y2 + margin)
+
+
+def region_matches(img_a, img_b, mask, margin=16, tolerance=4.0):
+    """
+    Checks whether two images agree around the masked area (mask: WatermarkMask).
+    Compares the ring of `margin` pixels surrounding the mask's bounding box
+    (the masked pixels themselves are ignored) and accepts a mean absolute
+    difference up to `tolerance` to allow for re-encoding noise.
+    """
+    if img_a.shape != img_b.shape or mask.bbox() is None:
+        return False
+
+    window = _mask_window(mask, margin)
+    x1, y1, x2, y2 = window
+    ring = mask.rasterize(window) == 0
+    if not ring.any():
+        return False
+
+    diff = cv2.absdiff(img_a[y1:y2, x1:x2], img_b[y1:y2, x1:x2])
+    return float(diff[ring].mean()) <= tolerance
+
+
+def apply_patch(target, source_result, mask):
+    """Copies the masked pixels of an inpainted result onto another image."""
+    out = target.copy()
+    if mask.bbox() is None:
+        return out
+    window = _mask_window(mask, 0)
+    x1, y1, x2, y2 = window
+    inside = mask.rasterize(window) > 0
+    out[y1:y2, x1:x2][inside] = source_result[y1:y2, x1:x2][inside]
+    return out
@@ -1,13 +1,22 @@
 import sys
 import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox,
                              QProgressBar, QGroupBox, QFormLayout, QSpinBox, QDoubleSpinBox, QLineEdit,
-                             QListWidget, QListWidgetItem, QAbstractItemView, QSlider)
-from PyQt6.QtGui import QPixmap, QImage, QPainter, QColor, QPen
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QPoint
+                             QListView, QAbstractItemView, QSlider, QCheckBox)
+from PyQt6.QtGui import QPixmap, QImage, QPainter, QColor, QPen, QImageReader
+from PyQt6.QtCore import (Qt, QThread, pyqtSignal, QPoint, QSize, QObject, QRunnable, QThreadPool,
+                          QAbstractListModel, QModelIndex)
 import cv2
 from watermark_remover import WatermarkRemover
+from dedup import find_near_duplicates, region_matches, apply_patch
+from rerun_cache import RerunCache
+import profiler
+from planner import plan_batch, format_duration
 
 class ImagePreviewWidget(QWidget):
     def __init__(self, placeholder_text="Image"):
@@ -185,6 +194,213 @@ class ImagePreviewWidget(QWidget):
         self.fit_btn.move(self.width() - btn_w - 10, 10)
         super().resizeEvent(event)
 
+VALID_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+THUMBNAIL_SIZE = 48
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(str, QImage)
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, path, signals, token, is_wanted):
+        super().__init__()
+        self.path = path
+        self.signals = signals
+        self.token = token
+        self.is_wanted = is_wanted
+
+    def run(self):
+        # Rows scrolled past since the request was queued are dropped unread
+        if not self.is_wanted(self.path, self.token):
+            return
+        with profiler.span("thumbnail", path=self.path):
+            self.load()
+
+    def load(self):
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid():
+            # Let the decoder scale down (JPEG decodes at reduced size directly)
+            reader.setScaledSize(size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        self.signals.ready.emit(self.path, image)
+
+class FileListModel(QAbstractListModel):
+    """
+    Flat list of file paths for the sidebar.
+    A dict from path to row gives O(1) duplicate checks and lookups, and
+    thumbnails are generated lazily (only for rows the view actually paints)
+    on a thread pool and kept in a bounded LRU cache. Requests run newest
+    first, and only the most recent `max_pending_thumbnails` stay wanted, so
+    fast scrolling never leaves the visible rows waiting behind stale ones.
+    """
+    def __init__(self, parent=None, thumbnail_cache_size=2000, max_pending_thumbnails=256):
+        super().__init__(parent)
+        self.paths = []
+        self.rows = {}
+        self.thumbnails = OrderedDict()
+        self.thumbnail_cache_size = thumbnail_cache_size
+        # path -> request token, most recent last; read by pool threads under the lock
+        self.pending_thumbnails = OrderedDict()
+        self.pending_lock = threading.Lock()
+        self.max_pending_thumbnails = max_pending_thumbnails
+        self.thumbnail_requests = 0
+        self.thumbnail_pool = QThreadPool(self)
+        self.thumbnail_pool.setMaxThreadCount(2)
+        self.thumbnail_signals = ThumbnailSignals()
+        self.thumbnail_signals.ready.connect(self.on_thumbnail_ready)
+        # Same-size placeholder keeps row heights uniform while thumbnails load
+        self.placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self.placeholder.fill(QColor(230, 230, 230))
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(path)
+        return None
+
+    def path_at(self, row):
+        return self.paths[row]
+
+    def row_of(self, path):
+        return self.rows.get(path, -1)
+
+    def add_paths(self, paths):
+        """Appends paths not already in the list. Returns the number added."""
+        new_paths = []
+        for p in paths:
+            if p not in self.rows:
+                self.rows[p] = len(self.paths) + len(new_paths)
+                new_paths.append(p)
+        if not new_paths:
+            return 0
+        start = len(self.paths)
+        self.beginInsertRows(QModelIndex(), start, start + len(new_paths) - 1)
+        self.paths.extend(new_paths)
+        self.endInsertRows()
+        return len(new_paths)
+
+    def remove_row(self, row):
+        if row < 0 or row >= len(self.paths):
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        path = self.paths.pop(row)
+        del self.rows[path]
+        for i in range(row, len(self.paths)):
+            self.rows[self.paths[i]] = i
+        self.endRemoveRows()
+        self.thumbnails.pop(path, None)
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths = []
+        self.rows = {}
+        self.endResetModel()
+        with self.pending_lock:
+            self.pending_thumbnails.clear()
+
+    def thumbnail(self, path):
+        pixmap = self.thumbnails.get(path)
+        if pixmap is not None:
+            self.thumbnails.move_to_end(path)
+            return pixmap
+        with self.pending_lock:
+            if path in self.pending_thumbnails:
+                self.pending_thumbnails.move_to_end(path)
+                return self.placeholder
+            self.thumbnail_requests += 1
+            token = self.thumbnail_requests
+            self.pending_thumbnails[path] = token
+            while len(self.pending_thumbnails) > self.max_pending_thumbnails:
+                # Oldest request: its row has long been scrolled away
+                self.pending_thumbnails.popitem(last=False)
+        # Higher priority runs first, so the newest request (a visible row) goes next
+        task = ThumbnailTask(path, self.thumbnail_signals, token, self.is_thumbnail_wanted)
+        self.thumbnail_pool.start(task, token % (1 << 30))
+        return self.placeholder
+
+    def is_thumbnail_wanted(self, path, token):
+        with self.pending_lock:
+            return self.pending_thumbnails.get(path) == token
+
+    def on_thumbnail_ready(self, path, image):
+        with self.pending_lock:
+            self.pending_thumbnails.pop(path, None)
+        if image.isNull() or path not in self.rows:
+            return
+        # QPixmap must be created on the GUI thread
+        self.thumbnails[path] = QPixmap.fromImage(image)
+        while len(self.thumbnails) > self.thumbnail_cache_size:
+            self.thumbnails.popitem(last=False)
+        index = self.index(self.rows[path])
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+class FolderScanThread(QThread):
+    """Walks a folder with os.scandir and reports image paths in chunks."""
+    files_found = pyqtSignal(list)
+    scan_finished = pyqtSignal(int)
+
+    def __init__(self, folder, recursive=False, chunk_size=500, exclude_dirs=()):
+        super().__init__()
+        self.folder = folder
+        self.recursive = recursive
+        self.chunk_size = chunk_size
+        self.exclude_dirs = {os.path.abspath(d) for d in exclude_dirs if d}
+        self.is_running = True
+
+    def run(self):
+        profiler.name_thread("FolderScanThread")
+        with profiler.span("folder_scan", folder=self.folder):
+            self.scan()
+
+    def scan(self):
+        total = 0
+        chunk = []
+        stack = [self.folder]
+        while stack and self.is_running:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"Could not scan {current}: {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                if not self.is_running:
+                    break
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and os.path.abspath(entry.path) not in self.exclude_dirs:
+                        subdirs.append(entry.path)
+                elif entry.name.lower().endswith(VALID_EXTS):
+                    chunk.append(entry.path)
+                    if len(chunk) >= self.chunk_size:
+                        self.files_found.emit(chunk)
+                        total += len(chunk)
+                        chunk = []
+            # Reverse so sub-folders are visited in name order
+            stack.extend(reversed(subdirs))
+
+        if chunk:
+            self.files_found.emit(chunk)
+            total += len(chunk)
+        self.scan_finished.emit(total)
+
+    def stop(self):
+        self.is_running = False
+
 class Worker(QThread):
     finished = pyqtSignal(bool, str)
     
@@ -198,14 +414,16 @@ class Worker(QThread):
         self.roi_ratio = roi_ratio
         
     def run(self):
+        profiler.name_thread("Worker")
         try:
-            success = self.remover.process_image(
-                self.input_path, 
-                self.output_path, 
-                threshold=self.threshold, 
-                dilation_iter=self.dilation,
-                roi_ratio=self.roi_ratio
-            )
+            with profiler.span("process_image", path=self.input_path):
+                success = self.remover.process_image(
+                    self.input_path, 
+                    self.output_path, 
+                    threshold=self.threshold, 
+                    dilation_iter=self.dilation,
+                    roi_ratio=self.roi_ratio
+                )
             if success:
                 self.finished.emit(True, self.output_path)
             else:
@@ -218,8 +436,11 @@ class BatchWorker(QThread):
     image_finished = pyqtSignal(str)
     progress_updated = pyqtSignal(int)
     batch_finished = pyqtSignal(bool, str)
+    plan_ready = pyqtSignal(str)
+    eta_updated = pyqtSignal(str)
     
-    def __init__(self, remover, input_files, output_dir, threshold, dilation, roi_ratio):
+    def __init__(self, remover, input_files, output_dir, threshold, dilation, roi_ratio, dedupe=False, cache=None,
+                 input_root=None):
         super().__init__()
         self.remover = remover
         self.input_files = input_files
@@ -227,10 +448,28 @@ class BatchWorker(QThread):
         self.threshold = threshold
         self.dilation = dilation
         self.roi_ratio = roi_ratio
+        self.dedupe = dedupe
+        self.cache = cache
+        self.input_root = input_root
+        # input path -> output path, assigned once the batch starts
+        self.output_paths = {}
+        self.collisions = 0
         self.is_running = True
+        self.count = 0
+        self.reused = 0
+        self.unchanged = 0
+        self.plan = None
+        self.started_at = 0.0
 
     def run(self):
-        count = 0
+        profiler.name_thread("BatchWorker")
+        with profiler.span("batch", files=len(self.input_files)):
+            self.run_batch()
+
+    def run_batch(self):
+        self.count = 0
+        self.reused = 0
+        self.unchanged = 0
         if not os.path.exists(self.output_dir):
             try:
                 os.makedirs(self.output_dir)
@@ -238,16 +477,142 @@ class BatchWorker(QThread):
                 self.batch_finished.emit(False, f"Could not create output directory: {e}")
                 return
 
-        for fpath in self.input_files:
+        # Pre-flight: headers only, largest resolution first, same-size files together
+        self.plan = plan_batch(self.input_files)
+        for f in self.plan.unreadable:
+            print(f"Skipping unreadable file {f.path}: {f.error}")
+            self.advance()
+        self.input_files = self.assign_output_paths(self.plan.ordered_paths)
+        self.started_at = time.monotonic()
+        self.plan_ready.emit(self.plan.summary())
+
+        if self.dedupe:
+            # Pre-pass: one inference per cluster of near-duplicate images
+            with profiler.span("dedupe_prepass"):
+                clusters = find_near_duplicates(self.input_files)
+        else:
+            clusters = [[f] for f in self.input_files]
+
+        if not self.dedupe and self.cache is None and self.remover.concurrency > 1:
+            # Tuned profile: overlap decode/encode of several images with inference
+            asyncio.run(self.run_pipelined())
+            clusters = []
+
+        for cluster in clusters:
             if not self.is_running:
                 break
-            
-            self.image_started.emit(fpath)
-            
-            fname = os.path.basename(fpath)
-            output_path = os.path.join(self.output_dir, fname)
-            
-            try:
+            if len(cluster) == 1:
+                self.process_single(cluster[0])
+            else:
+                self.process_cluster(cluster)
+
+        message = "Batch processing complete."
+        if self.reused:
+            message += f" Reused results for {self.reused} near-duplicate images."
+        if self.unchanged:
+            message += f" Skipped {self.unchanged} images with unchanged masks."
+        if self.plan.unreadable:
+            message += f" {len(self.plan.unreadable)} unreadable files were skipped."
+        if self.collisions:
+            message += f" {self.collisions} files were skipped because another file has the same output name."
+        self.batch_finished.emit(True, message)
+
+    async def run_pipelined(self):
+        jobs = ((f, self.output_path_for(f)) for f in self.input_files)
+        results = self.remover.aprocess_many(
+            jobs,
+            concurrency=self.remover.concurrency,
+            threshold=self.threshold,
+            dilation_iter=self.dilation,
+            roi_ratio=self.roi_ratio
+        )
+        try:
+            async for fpath, output_path, success in results:
+                # Results arrive in completion order; report each pair together
+                self.image_started.emit(fpath)
+                if success:
+                    self.image_finished.emit(output_path)
+                self.advance(fpath)
+                if not self.is_running:
+                    break
+        finally:
+            await results.aclose()
+
+    def output_path_for(self, fpath):
+        return self.output_paths[fpath]
+
+    def assign_output_paths(self, paths):
+        """
+        Maps inputs to outputs, mirroring their path below input_root (files from
+        elsewhere keep just their name) and creating the output subfolders.
+        A file whose output would overwrite another's is skipped and counted.
+        Returns the paths that will be processed.
+        """
+        self.output_paths = {}
+        self.collisions = 0
+        taken = set()
+        kept = []
+        for fpath in paths:
+            rel = os.path.basename(fpath)
+            if self.input_root:
+                try:
+                    rel_to_root = os.path.relpath(fpath, self.input_root)
+                except ValueError:
+                    # Different drive on Windows
+                    rel_to_root = os.pardir
+                if rel_to_root != os.pardir and not rel_to_root.startswith(os.pardir + os.sep):
+                    rel = rel_to_root
+            output_path = os.path.join(self.output_dir, rel)
+            key = os.path.normcase(os.path.abspath(output_path))
+            if key in taken:
+                print(f"Skipping {fpath}: output {output_path} is already used by another file")
+                self.collisions += 1
+                self.advance()
+                continue
+            taken.add(key)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            self.output_paths[fpath] = output_path
+            kept.append(fpath)
+        return kept
+
+    def advance(self, fpath=None):
+        self.count += 1
+        self.progress_updated.emit(self.count)
+        if self.plan is not None and fpath is not None:
+            self.plan.mark_done(fpath)
+            self.eta_updated.emit(self.estimate_eta())
+
+    def estimate_eta(self):
+        # Scale the plan's remaining estimate by how fast we are actually going
+        remaining = self.plan.remaining
+        done_estimate = self.plan.total_seconds - remaining
+        if done_estimate > 0:
+            remaining *= (time.monotonic() - self.started_at) / done_estimate
+        return format_duration(remaining)
+
+    def process_single(self, fpath):
+        with profiler.span("process_image", path=fpath):
+            self._process_single(fpath)
+
+    def _process_single(self, fpath):
+        self.image_started.emit(fpath)
+        output_path = self.output_path_for(fpath)
+        
+        try:
+            if self.cache is not None:
+                # Incremental re-run: only re-inpaint when the mask changed
+                status = self.cache.process_image(
+                    self.remover,
+                    fpath,
+                    output_path,
+                    threshold=self.threshold,
+                    dilation_iter=self.dilation,
+                    roi_ratio=self.roi_ratio
+                )
+                if status == "reused":
+                    self.unchanged += 1
+                success = status != "failed"
+            else:
                 success = self.remover.process_image(
                     fpath, 
                     output_path, 
@@ -255,17 +620,74 @@ class BatchWorker(QThread):
                     dilation_iter=self.dilation,
                     roi_ratio=self.roi_ratio
                 )
-                if success:
-                    self.image_finished.emit(output_path)
-                else:
-                    pass
-            except Exception as e:
-                print(f"Error processing {fname}: {e}")
-            
-            count += 1
-            self.progress_updated.emit(count)
-            
-        self.batch_finished.emit(True, "Batch processing complete.")
+            if success:
+                self.image_finished.emit(output_path)
+        except Exception as e:
+            print(f"Error processing {os.path.basename(fpath)}: {e}")
+        
+        self.advance(fpath)
+
+    def process_cluster(self, cluster):
+        with profiler.span("process_cluster", files=len(cluster)):
+            self._process_cluster(cluster)
+
+    def _process_cluster(self, cluster):
+        rep_path = cluster[0]
+        if self.remover.is_large_image(rep_path):
+            # Cluster members share dimensions: all of them need the bounded-memory
+            # path, which never holds two full frames to compare
+            for fpath in cluster:
+                if not self.is_running:
+                    return
+                self.process_single(fpath)
+            return
+
+        self.image_started.emit(rep_path)
+
+        with profiler.span("decode", path=rep_path):
+            rep_img = cv2.imread(rep_path)
+        if rep_img is None:
+            print(f"Could not load image: {rep_path}")
+            self.advance(rep_path)
+            for fpath in cluster[1:]:
+                if not self.is_running:
+                    return
+                self.process_single(fpath)
+            return
+
+        try:
+            rep_result, mask = self.remover.remove_watermark(
+                rep_img, self.threshold, self.dilation, self.roi_ratio
+            )
+        except Exception as e:
+            print(f"Error processing {os.path.basename(rep_path)}: {e}")
+            rep_result, mask = None, None
+
+        if rep_result is not None and cv2.imwrite(self.output_path_for(rep_path), rep_result):
+            self.image_finished.emit(self.output_path_for(rep_path))
+        self.advance(rep_path)
+
+        for fpath in cluster[1:]:
+            if not self.is_running:
+                return
+            img = None
+            if rep_result is not None:
+                with profiler.span("decode", path=fpath):
+                    img = cv2.imread(fpath)
+            if img is None or not region_matches(rep_img, img, mask):
+                # Not close enough around the watermark: inpaint it on its own
+                self.process_single(fpath)
+                continue
+
+            self.image_started.emit(fpath)
+            output_path = self.output_path_for(fpath)
+            with profiler.span("apply_patch", path=fpath):
+                written = cv2.imwrite(output_path, apply_patch(img, rep_result, mask))
+            if written:
+                print(f"Reused patch: {rep_path} -> {output_path}")
+                self.reused += 1
+                self.image_finished.emit(output_path)
+            self.advance(fpath)
 
     def stop(self):
         self.is_running = False
@@ -280,6 +702,12 @@ class MainWindow(QMainWindow):
         self.current_image_path = None
         self.processed_image_path = "processed_temp.png"
         self.output_folder_path = None
+        # Folder the sidebar was loaded from; batch outputs mirror paths below it
+        self.input_folder_path = None
+        self.scan_thread = None
+        self.is_scanning = False
+        self.rerun_cache = RerunCache()
+        self.batch_eta = ""
         
         self.init_ui()
         
@@ -305,10 +733,18 @@ class MainWindow(QMainWindow):
         sidebar_label = QLabel("Files to Process")
         sidebar_layout.addWidget(sidebar_label)
         
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        self.file_list_widget.itemClicked.connect(self.on_file_list_clicked)
-        sidebar_layout.addWidget(self.file_list_widget)
+        self.file_model = FileListModel(self)
+        self.file_list_view = QListView()
+        self.file_list_view.setModel(self.file_model)
+        self.file_list_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        # Uniform sizes let the view skip measuring every row (needed for 100k+ files)
+        self.file_list_view.setUniformItemSizes(True)
+        self.file_list_view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.file_list_view.clicked.connect(self.on_file_list_clicked)
+        sidebar_layout.addWidget(self.file_list_view)
+        
+        self.recursive_check = QCheckBox("Include subfolders")
+        sidebar_layout.addWidget(self.recursive_check)
         
         sidebar_btns_layout = QHBoxLayout()
         self.btn_add_files = QPushButton("Add Files")
@@ -348,6 +784,15 @@ class MainWindow(QMainWindow):
         
         params_layout.addRow("Edge Threshold:", self.threshold_spin)
         params_layout.addRow("Mask Expansion:", self.dilation_spin)
+        
+        self.dedupe_check = QCheckBox("Reuse results for near-duplicates")
+        self.dedupe_check.setToolTip("Batch: inpaint one image per group of near-identical copies and reuse its patch.")
+        params_layout.addRow(self.dedupe_check)
+        
+        self.incremental_check = QCheckBox("Incremental re-run")
+        self.incremental_check.setToolTip("Batch: cache decoded ROIs and edges, and only re-inpaint images whose mask changed since the last run.")
+        self.incremental_check.toggled.connect(self.on_incremental_toggled)
+        params_layout.addRow(self.incremental_check)
         params_group.setLayout(params_layout)
         
         top_layout.addWidget(params_group)
@@ -476,26 +921,23 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Error", "Failed to initialize AI model.")
 
     def add_files_to_list(self):
-        fnames, _ = QFileDialog.getOpenFileNames(self, "Add Images", "", "Image Files (*.png *.jpg *.jpeg *.bmp)")
+        fnames, _ = QFileDialog.getOpenFileNames(self, "Add Images", "", "Image Files (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)")
         if fnames:
-            for f in fnames:
-                existing_items = [self.file_list_widget.item(i).text() for i in range(self.file_list_widget.count())]
-                if f not in existing_items:
-                    self.file_list_widget.addItem(f)
+            added = self.file_model.add_paths(fnames)
             
             self.update_batch_ui_state()
-            self.status_label.setText(f"Added {len(fnames)} files.")
+            self.status_label.setText(f"Added {added} files.")
 
     def remove_file_from_list(self):
-        row = self.file_list_widget.currentRow()
+        row = self.file_list_view.currentIndex().row()
         if row >= 0:
-            self.file_list_widget.takeItem(row)
+            self.file_model.remove_row(row)
             self.current_image_path = None
             self.process_btn.setEnabled(False)
             self.update_batch_ui_state()
 
-    def on_file_list_clicked(self, item):
-        fpath = item.text()
+    def on_file_list_clicked(self, index):
+        fpath = self.file_model.path_at(index.row())
         if os.path.exists(fpath):
             self.current_image_path = fpath
             self.display_image(fpath, self.original_widget)
@@ -508,26 +950,59 @@ class MainWindow(QMainWindow):
     def select_input_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Input Folder")
         if folder:
-            self.file_list_widget.clear()
-            
-            valid_exts = ('.png', '.jpg', '.jpeg', '.bmp')
-            files = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(valid_exts)]
-            
-            if not files:
-                QMessageBox.warning(self, "No Images", "No supported images found in this folder.")
-                return
-            
-            self.file_list_widget.addItems(files)
+            self.stop_folder_scan()
+            self.file_model.clear()
+            self.input_folder_path = folder
+            self.current_image_path = None
+            self.process_btn.setEnabled(False)
             self.update_batch_ui_state()
-            self.status_label.setText(f"Loaded folder: {len(files)} images.")
             
             if not self.output_folder_path:
                 self.output_folder_path = os.path.join(folder, "cleaned")
                 self.output_line.setText(self.output_folder_path)
+            
+            self.status_label.setText(f"Scanning {folder}...")
+            self.is_scanning = True
+            self.scan_thread = FolderScanThread(
+                folder,
+                recursive=self.recursive_check.isChecked(),
+                exclude_dirs=(self.output_folder_path,)
+            )
+            self.scan_thread.files_found.connect(self.on_scan_files_found)
+            self.scan_thread.scan_finished.connect(self.on_scan_finished)
+            self.scan_thread.start()
+
+    def stop_folder_scan(self):
+        if self.scan_thread is not None:
+            self.scan_thread.files_found.disconnect()
+            self.scan_thread.scan_finished.disconnect()
+            self.scan_thread.stop()
+            self.scan_thread.wait()
+            self.scan_thread = None
+        self.is_scanning = False
+
+    def on_scan_files_found(self, paths):
+        self.file_model.add_paths(paths)
+        self.update_batch_ui_state()
+        self.status_label.setText(f"Scanning... {self.file_model.rowCount()} images found.")
+
+    def on_scan_finished(self, total):
+        self.is_scanning = False
+        self.update_batch_ui_state()
+        if total == 0:
+            self.status_label.setText("No images found.")
+            QMessageBox.warning(self, "No Images", "No supported images found in this folder.")
+            return
+        self.status_label.setText(f"Loaded folder: {total} images.")
 
     def update_batch_ui_state(self):
-        has_files = self.file_list_widget.count() > 0
-        self.batch_process_btn.setEnabled(has_files)
+        has_files = self.file_model.rowCount() > 0
+        self.batch_process_btn.setEnabled(has_files and not self.is_scanning)
+
+    def on_incremental_toggled(self, checked):
+        if not checked:
+            # Free the cached crops; the next incremental run starts fresh
+            self.rerun_cache.clear()
 
     def select_output_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
@@ -575,11 +1050,11 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Processing Error", message)
 
     def process_batch(self):
-        count = self.file_list_widget.count()
-        if count == 0 or not self.remover:
+        count = self.file_model.rowCount()
+        if count == 0 or not self.remover or self.is_scanning:
             return
             
-        files_to_process = [self.file_list_widget.item(i).text() for i in range(count)]
+        files_to_process = list(self.file_model.paths)
             
         if not self.output_folder_path:
             # Try to determine default from first file
@@ -601,20 +1076,33 @@ class MainWindow(QMainWindow):
             self.output_folder_path,
             self.threshold_spin.value(),
             self.dilation_spin.value(),
-            roi
+            roi,
+            dedupe=self.dedupe_check.isChecked(),
+            cache=self.rerun_cache if self.incremental_check.isChecked() else None,
+            input_root=self.input_folder_path
         )
         self.batch_worker.image_started.connect(self.on_batch_image_started)
         self.batch_worker.image_finished.connect(self.on_batch_image_finished)
         self.batch_worker.progress_updated.connect(self.progress_bar.setValue)
+        self.batch_worker.plan_ready.connect(self.on_batch_plan_ready)
+        self.batch_worker.eta_updated.connect(self.on_batch_eta_updated)
         self.batch_worker.batch_finished.connect(self.on_batch_finished)
         self.batch_worker.start()
 
+    def on_batch_plan_ready(self, summary):
+        self.batch_eta = ""
+        self.status_label.setText(f"Pre-flight: {summary}")
+
+    def on_batch_eta_updated(self, eta):
+        self.batch_eta = eta
+
     def on_batch_image_started(self, path):
         self.display_image(path, self.original_widget)
-        self.status_label.setText(f"Processing: {os.path.basename(path)}")
-        items = self.file_list_widget.findItems(path, Qt.MatchFlag.MatchExactly)
-        if items:
-            self.file_list_widget.setCurrentItem(items[0])
+        eta = f" (ETA {self.batch_eta})" if self.batch_eta else ""
+        self.status_label.setText(f"Processing: {os.path.basename(path)}{eta}")
+        row = self.file_model.row_of(path)
+        if row >= 0:
+            self.file_list_view.setCurrentIndex(self.file_model.index(row))
 
     def on_batch_image_finished(self, path):
         self.display_image(path, self.result_widget)
@@ -631,21 +1119,27 @@ class MainWindow(QMainWindow):
         self.batch_input_btn.setEnabled(enabled)
         self.output_btn.setEnabled(enabled)
         self.process_btn.setEnabled(enabled and self.current_image_path is not None)
-        self.batch_process_btn.setEnabled(enabled and self.file_list_widget.count() > 0)
+        self.batch_process_btn.setEnabled(enabled and self.file_model.rowCount() > 0 and not self.is_scanning)
         self.threshold_spin.setEnabled(enabled)
         self.dilation_spin.setEnabled(enabled)
-        self.file_list_widget.setEnabled(enabled)
+        self.dedupe_check.setEnabled(enabled)
+        self.incremental_check.setEnabled(enabled)
+        self.recursive_check.setEnabled(enabled)
+        self.file_list_view.setEnabled(enabled)
 
     def display_image(self, path, widget):
         # Updates the ImagePreviewWidget
-        widget.set_image(path)
+        with profiler.span("display_image", path=path):
+            widget.set_image(path)
 
 class InitThread(QThread):
     finished = pyqtSignal(object)
     
     def run(self):
+        profiler.name_thread("InitThread")
         try:
-            remover = WatermarkRemover()
+            with profiler.span("InitThread"):
+                remover = WatermarkRemover()
             self.finished.emit(remover)
         except Exception:
             self.finished.emit(None)
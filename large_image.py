@@ -0,0 +1,295 @@
+import os
+import struct
+import threading
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from PIL import Image
+import profiler
+
+# Rows decoded/written per chunk when streaming the untouched part of an image
+CHUNK_ROWS = 256
+# Raw pixel layouts RegionReader can read: rawmode -> (bytes per pixel, channel order to BGR)
+RAW_LAYOUTS = {
+    "RGB": (3, [2, 1, 0]),
+    "BGR": (3, [0, 1, 2]),
+    "RGBX": (4, [2, 1, 0]),
+    "BGRX": (4, [0, 1, 2]),
+}
+
+
+_limit_lock = threading.Lock()
+_limit_users = 0
+_saved_limit = None
+
+
+@contextmanager
+def unlimited_pixels():
+    """
+    Lifts Pillow's decompression-bomb limit (about 179 MP) while open, so header
+    and band reads work on the very large scans this module exists for. The limit
+    is process-wide, so nested/concurrent users are counted and it is restored
+    when the last one leaves.
+    """
+    global _limit_users, _saved_limit
+    with _limit_lock:
+        if _limit_users == 0:
+            _saved_limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+        _limit_users += 1
+    try:
+        yield
+    finally:
+        with _limit_lock:
+            _limit_users -= 1
+            if _limit_users == 0:
+                Image.MAX_IMAGE_PIXELS = _saved_limit
+
+
+def image_header(path):
+    """Reads (width, height, format) without decoding pixels. Returns None if unreadable."""
+    try:
+        with unlimited_pixels(), Image.open(path) as im:
+            return im.size[0], im.size[1], im.format
+    except (OSError, ValueError, SyntaxError):
+        # Missing file, unknown format or a broken header
+        return None
+
+
+class RegionReader:
+    """
+    Decodes horizontal bands of an image without decoding the whole frame, where
+    the file layout allows it: RGB images whose pixel data Pillow reports as
+    uncompressed "raw" tiles (BMP, uncompressed TIFF in one or more strips/tiles).
+    Pillow is only asked for the layout (im.tile); the rows themselves are read
+    from the file with numpy, so no Pillow decoder internals are involved.
+    Compressed formats (PNG, JPEG, LZW/Deflate TIFF) and other modes are not
+    region_capable and are decoded whole.
+    """
+    def __init__(self, path):
+        self.path = path
+        with unlimited_pixels(), Image.open(path) as im:
+            self.width, self.height = im.size
+            self.format = im.format
+            self.mode = im.mode
+            self.tiles = [self._raw_layout(t) for t in im.tile]
+        self.region_capable = self.mode == "RGB" and bool(self.tiles) and None not in self.tiles
+
+    @staticmethod
+    def _raw_layout(tile):
+        """(x0, y0, x1, y1, offset, row_bytes, bytes_per_pixel, order, bottom_up) or None."""
+        name, extents, offset, args = tuple(tile)[:4]
+        if isinstance(args, str):
+            args = (args,)
+        if name != "raw" or not args or args[0] not in RAW_LAYOUTS:
+            return None
+        x0, y0, x1, y1 = extents
+        pixel_bytes, order = RAW_LAYOUTS[args[0]]
+        stride = args[1] if len(args) > 1 and args[1] else (x1 - x0) * pixel_bytes
+        orientation = args[2] if len(args) > 2 else 1
+        return x0, y0, x1, y1, offset, stride, pixel_bytes, order, orientation < 0
+
+    def read_rows(self, y0, y1):
+        """Returns rows [y0, y1) as a BGR uint8 array."""
+        y0 = max(0, y0)
+        y1 = min(self.height, y1)
+        if not self.region_capable:
+            raise ValueError(f"Region decoding not supported for {self.path}")
+
+        with profiler.span("decode_rows", rows=y1 - y0):
+            out = np.empty((y1 - y0, self.width, 3), dtype=np.uint8)
+            with open(self.path, "rb") as f:
+                for x0, ty0, x1, ty1, offset, stride, pixel_bytes, order, bottom_up in self.tiles:
+                    r0, r1 = max(y0, ty0), min(y1, ty1)
+                    if r1 <= r0:
+                        continue
+                    # Bottom-up tiles store their last row first
+                    first = ty1 - r1 if bottom_up else r0 - ty0
+                    f.seek(offset + first * stride)
+                    data = f.read((r1 - r0) * stride)
+                    if len(data) < (r1 - r0) * stride:
+                        raise ValueError(f"Truncated image data in {self.path}")
+                    rows = np.frombuffer(data, dtype=np.uint8).reshape(r1 - r0, stride)
+                    pixels = rows[:, :(x1 - x0) * pixel_bytes].reshape(r1 - r0, x1 - x0, pixel_bytes)
+                    if bottom_up:
+                        pixels = pixels[::-1]
+                    out[r0 - y0:r1 - y0, x0:x1] = pixels[:, :, order]
+            return out
+
+
+class TiffRowWriter:
+    """
+    Writes an uncompressed RGB baseline TIFF whose pixel data is laid out up
+    front, so rows can be written in any order straight from BGR bands.
+    """
+    ROWS_PER_STRIP = 64
+
+    def __init__(self, path, width, height):
+        self.width = width
+        self.height = height
+        self.row_bytes = width * 3
+        n_strips = (height + self.ROWS_PER_STRIP - 1) // self.ROWS_PER_STRIP
+
+        entries = 10
+        ifd_size = 2 + entries * 12 + 4
+        bps_offset = 8 + ifd_size
+        offsets_offset = bps_offset + 6
+        counts_offset = offsets_offset + 4 * n_strips
+        self.data_offset = counts_offset + 4 * n_strips
+
+        strip_offsets = []
+        strip_counts = []
+        for i in range(n_strips):
+            rows = min(self.ROWS_PER_STRIP, height - i * self.ROWS_PER_STRIP)
+            strip_offsets.append(self.data_offset + i * self.ROWS_PER_STRIP * self.row_bytes)
+            strip_counts.append(rows * self.row_bytes)
+
+        def entry(tag, typ, count, value):
+            if typ == 3 and count == 1:
+                return struct.pack("<HHIHH", tag, typ, count, value, 0)
+            return struct.pack("<HHII", tag, typ, count, value)
+
+        def strip_entry(tag, offset, values):
+            # A single LONG fits in the entry itself
+            return entry(tag, 4, len(values), values[0] if len(values) == 1 else offset)
+
+        ifd = struct.pack("<H", entries)
+        ifd += entry(256, 4, 1, width)                    # ImageWidth
+        ifd += entry(257, 4, 1, height)                   # ImageLength
+        ifd += entry(258, 3, 3, bps_offset)               # BitsPerSample 8,8,8
+        ifd += entry(259, 3, 1, 1)                        # Compression: none
+        ifd += entry(262, 3, 1, 2)                        # Photometric: RGB
+        ifd += strip_entry(273, offsets_offset, strip_offsets)
+        ifd += entry(277, 3, 1, 3)                        # SamplesPerPixel
+        ifd += entry(278, 4, 1, self.ROWS_PER_STRIP)      # RowsPerStrip
+        ifd += strip_entry(279, counts_offset, strip_counts)
+        ifd += entry(284, 3, 1, 1)                        # PlanarConfiguration: chunky
+        ifd += struct.pack("<I", 0)
+
+        self.f = open(path, "wb")
+        self.f.write(b"II*\x00" + struct.pack("<I", 8))
+        self.f.write(ifd)
+        self.f.write(struct.pack("<HHH", 8, 8, 8))
+        self.f.write(struct.pack(f"<{n_strips}I", *strip_offsets))
+        self.f.write(struct.pack(f"<{n_strips}I", *strip_counts))
+        self.f.truncate(self.data_offset + height * self.row_bytes)
+
+    def write_rows(self, y0, rows_bgr):
+        self.f.seek(self.data_offset + y0 * self.row_bytes)
+        self.f.write(np.ascontiguousarray(rows_bgr[:, :, ::-1]).tobytes())
+
+    def close(self):
+        self.f.close()
+
+
+class BmpRowWriter:
+    """Writes a 24-bit bottom-up BMP; rows can be written in any order."""
+    def __init__(self, path, width, height):
+        self.width = width
+        self.height = height
+        self.row_bytes = (width * 3 + 3) & ~3
+        self.data_offset = 54
+        size = self.data_offset + self.row_bytes * height
+
+        self.f = open(path, "wb")
+        self.f.write(b"BM" + struct.pack("<IHHI", size, 0, 0, self.data_offset))
+        self.f.write(struct.pack("<IiiHHIIiiII", 40, width, height, 1, 24, 0, self.row_bytes * height, 2835, 2835, 0, 0))
+        self.f.truncate(size)
+
+    def write_rows(self, y0, rows_bgr):
+        padded = np.zeros((rows_bgr.shape[0], self.row_bytes), dtype=np.uint8)
+        padded[:, :self.width * 3] = rows_bgr.reshape(rows_bgr.shape[0], -1)
+        # Bottom-up: image row y lives at file row height-1-y
+        self.f.seek(self.data_offset + (self.height - y0 - rows_bgr.shape[0]) * self.row_bytes)
+        self.f.write(padded[::-1].tobytes())
+
+    def close(self):
+        self.f.close()
+
+
+ROW_WRITERS = {
+    ".tif": TiffRowWriter,
+    ".tiff": TiffRowWriter,
+    ".bmp": BmpRowWriter,
+}
+
+
+def process_large_image(remover, input_path, output_path, threshold=100, dilation_iter=3.0, roi_ratio=(0.3, 0.15)):
+    """
+    Bounded-memory variant of WatermarkRemover.process_image for very large images,
+    giving the same pixels. It works in two passes:
+    1. detection: only the ROI rows are decoded (in chunks), keeping just their
+       grayscale ROI crop;
+    2. inpainting: only the rows of the mask's context window are decoded, and
+       inpaint_window() returns just that patched window.
+    region_capable inputs (uncompressed RGB BMP/TIFF) written to TIFF/BMP then
+    stream every row through in chunks, pasting the window in. Other inputs are
+    decoded once (nothing else can decode from the bottom) and patched in place,
+    with no full-frame mask, copies or results.
+    """
+    try:
+        reader = RegionReader(input_path)
+    except Exception as e:
+        print(f"Could not load image: {input_path} ({e})")
+        return False
+
+    w, h = reader.width, reader.height
+    writer_cls = ROW_WRITERS.get(os.path.splitext(output_path)[1].lower())
+    streamed = reader.region_capable and writer_cls is not None
+
+    img = None
+    if streamed:
+        read_rows = reader.read_rows
+    else:
+        with profiler.span("decode", path=input_path):
+            img = cv2.imread(input_path)
+        if img is None:
+            print(f"Could not load image: {input_path}")
+            return False
+        # Views into the decoded frame, no copies
+        read_rows = lambda y0, y1: img[y0:y1]
+
+    # Pass 1: detection on the ROI rows only
+    roi_box = remover.roi_box(h, w, roi_ratio)
+    roi_x, roi_y = roi_box[:2]
+    with profiler.span("detect_watermark"):
+        gray = np.concatenate([
+            cv2.cvtColor(read_rows(y, min(y + CHUNK_ROWS, h))[:, roi_x:], cv2.COLOR_BGR2GRAY)
+            for y in range(roi_y, h, CHUNK_ROWS)
+        ])
+        mask = remover.locate_from_edges(remover.roi_edges(gray, threshold), (h, w), roi_box, dilation_iter)
+        del gray
+
+    # Pass 2: inpaint the context window of the detected mask
+    window = remover.context_window(mask)
+    if window is None:
+        print(f"Empty mask for {input_path}")
+        return False
+    x1, y1, x2, y2 = window
+    patch = remover.inpaint_window(read_rows(y1, y2)[:, x1:x2], mask, window)
+    if patch is None:
+        return False
+
+    if not streamed:
+        img[y1:y2, x1:x2] = patch
+        with profiler.span("encode", path=output_path):
+            if not cv2.imwrite(output_path, img):
+                print(f"Could not save image: {output_path}")
+                return False
+        print(f"Processed (large): {input_path} -> {output_path}")
+        return True
+
+    with profiler.span("encode_streaming", path=output_path):
+        writer = writer_cls(output_path, w, h)
+        try:
+            for y in range(0, h, CHUNK_ROWS):
+                y_end = min(y + CHUNK_ROWS, h)
+                rows = reader.read_rows(y, y_end)
+                p0, p1 = max(y, y1), min(y_end, y2)
+                if p1 > p0:
+                    rows[p0 - y:p1 - y, x1:x2] = patch[p0 - y1:p1 - y1]
+                writer.write_rows(y, rows)
+        finally:
+            writer.close()
+    print(f"Processed (large, streamed): {input_path} -> {output_path}")
+    return True
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import cv2
+import numpy as np
+from PIL import Image
+from large_image import RegionReader, TiffRowWriter, BmpRowWriter, process_large_image
+
+# Checks for the bounded-memory path; run with `python large_image_test.py` (pytest also collects the test_* functions)
+
+ROW_RANGES = [(0, 1), (0, 64), (63, 65), (100, 333), (950, 1001)]
+
+
+def sample_image(width=1333, height=1001, seed=0):
+    """Noisy gradient with a light logo-like mark in the bottom-right corner (BGR)."""
+    rng = np.random.default_rng(seed)
+    gx = np.linspace(0, 255, width, dtype=np.float32)
+    gy = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.stack([gx + 0 * gy, gy + 0 * gx, (gx + gy) / 2], axis=2)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    cv2.putText(img, "Gemini", (width - 170, height - 25), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (245, 245, 245), 2, cv2.LINE_AA)
+    # Marks in the top-left corner of the default ROI and against the right edge: the
+    # mask then spans the whole ROI and its context window reaches far above it
+    roi_x, roi_y = width - int(width * 0.3), height - int(height * 0.15)
+    cv2.rectangle(img, (roi_x, roi_y), (roi_x + 20, roi_y + 12), (20, 20, 20), 2)
+    cv2.rectangle(img, (width - 30, height - 40), (width - 1, height - 20), (20, 20, 20), 2)
+    return img
+
+
+def write_inputs(folder, img):
+    """The same pixels in every layout RegionReader handles, plus one it must refuse."""
+    rgb = Image.fromarray(img[:, :, ::-1])
+    paths = {
+        "bmp": os.path.join(folder, "pil.bmp"),
+        "tif": os.path.join(folder, "pil.tif"),
+        "strips": os.path.join(folder, "strips.tif"),
+        "bmp_rows": os.path.join(folder, "rows.bmp"),
+        "lzw": os.path.join(folder, "lzw.tif"),
+    }
+    rgb.save(paths["bmp"])
+    rgb.save(paths["tif"])
+    rgb.save(paths["lzw"], compression="tiff_lzw")
+    h, w = img.shape[:2]
+    for key, writer_cls in (("strips", TiffRowWriter), ("bmp_rows", BmpRowWriter)):
+        writer = writer_cls(paths[key], w, h)
+        # Rows may arrive in any order
+        for y in reversed(range(0, h, 100)):
+            writer.write_rows(y, img[y:y + 100])
+        writer.close()
+    return paths
+
+
+def test_region_reader():
+    img = sample_image()
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_inputs(folder, img)
+        for key in ("bmp", "tif", "strips", "bmp_rows"):
+            reader = RegionReader(paths[key])
+            assert reader.region_capable, key
+            assert (reader.width, reader.height) == (img.shape[1], img.shape[0])
+            for y0, y1 in ROW_RANGES:
+                assert np.array_equal(reader.read_rows(y0, y1), img[y0:y1]), (key, y0, y1)
+        assert not RegionReader(paths["lzw"]).region_capable
+
+
+def test_row_writers():
+    img = sample_image()
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_inputs(folder, img)
+        for key in ("strips", "bmp_rows"):
+            assert np.array_equal(cv2.imread(paths[key]), img), key
+            with Image.open(paths[key]) as im:
+                assert np.array_equal(np.asarray(im.convert("RGB"))[:, :, ::-1], img), key
+
+
+def make_remover(large_image_pixels):
+    from watermark_remover import WatermarkRemover
+    remover = WatermarkRemover(use_profile=False, device="cpu", large_image_pixels=large_image_pixels)
+    # Deterministic stand-in for LaMa (returns BGR like LaMa), so no weights are needed
+    remover.model = lambda img_rgb, mask, config: cv2.inpaint(
+        cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR), mask, 5, cv2.INPAINT_TELEA
+    )
+    return remover
+
+
+def test_large_path_matches_normal_path():
+    img = sample_image()
+    normal = make_remover(None)
+    large = make_remover(1)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_inputs(folder, img)
+        for key in ("bmp", "tif", "lzw"):
+            for ext in (".bmp", ".tif", ".png"):
+                expected = os.path.join(folder, f"normal_{key}{ext}")
+                actual = os.path.join(folder, f"large_{key}{ext}")
+                assert normal.process_image(paths[key], expected)
+                assert process_large_image(large, paths[key], actual)
+                assert np.array_equal(cv2.imread(actual), cv2.imread(expected)), (key, ext)
+                assert not np.array_equal(cv2.imread(actual), img), (key, ext)
+
+
+def run_tests():
+    print("Starting large-image checks...")
+    all_passed = True
+    for name, test in list(globals().items()):
+        if not name.startswith("test_"):
+            continue
+        try:
+            test()
+            print(f"  PASS: {name}")
+        except AssertionError as e:
+            print(f"  FAILED: {name} {e}")
+            all_passed = False
+
+    if all_passed:
+        print("\nALL TESTS PASSED.")
+    else:
+        print("\nSOME TESTS FAILED.")
+    return all_passed
+
+if __name__ == "__main__":
+    run_tests()
@@ -1,5 +1,85 @@
+import os
 import sys
-from gui import main
+import argparse
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Gemini Watermark Cleaner")
+    parser.add_argument("--watch", nargs="+", metavar="DIR",
+                        help="Run headless and keep cleaning new images dropped into these folders.")
+    parser.add_argument("--output", metavar="DIR",
+                        help="Output folder for --watch (default: <first input>/cleaned).")
+    parser.add_argument("--recursive", action="store_true", help="Also watch sub-folders.")
+    parser.add_argument("--threshold", type=float, default=100.0, help="Canny edge threshold.")
+    parser.add_argument("--dilation", type=float, default=3.0, help="Mask expansion width.")
+    parser.add_argument("--roi", nargs=2, type=float, default=(0.3, 0.15), metavar=("W", "H"),
+                        help="Bottom-right search box as width/height ratios.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds.")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Seconds a file's size/mtime must be stable before it is processed.")
+    parser.add_argument("--profile", metavar="TRACE.json",
+                        help="Record a Chrome/Perfetto trace of all threads (same as GWC_PROFILE=TRACE.json).")
+    parser.add_argument("--profile-torch", action="store_true",
+                        help="With --profile, also record torch operator events of the LaMa forward pass.")
+    return parser.parse_args(argv)
+
+
+def parse_tune_args(argv):
+    parser = argparse.ArgumentParser(prog="main.py tune",
+                                     description="Benchmark this machine and save the fastest settings.")
+    parser.add_argument("--budget", type=float, default=120.0, help="Time budget in seconds.")
+    parser.add_argument("--profile-path", metavar="PATH",
+                        help="Where to save the profile (default: GWC_TUNING_PROFILE or ~/.config/gemini_watermark_cleaner/profile.json).")
+    return parser.parse_args(argv)
+
+
+def run_tune(args):
+    import tuning
+
+    profile = tuning.tune(budget=args.budget, path=args.profile_path)
+    if profile is None:
+        return 1
+    print(f"Best: device={profile['device']} torch_threads={profile['torch_threads']} "
+          f"io_workers={profile['io_workers']} concurrency={profile['concurrency']}")
+    return 0
+
+
+def run_watch(args):
+    from watermark_remover import WatermarkRemover
+    from watcher import FolderWatcher
+
+    output_dir = args.output or os.path.join(args.watch[0], "cleaned")
+    remover = WatermarkRemover()
+    if not remover.model:
+        print("Model not loaded.")
+        return 1
+
+    watcher = FolderWatcher(
+        remover,
+        args.watch,
+        output_dir,
+        threshold=args.threshold,
+        dilation=args.dilation,
+        roi_ratio=tuple(args.roi),
+        recursive=args.recursive,
+        poll_interval=args.interval,
+        settle_time=args.settle
+    )
+    watcher.run_forever()
+    return 0
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if sys.argv[1:2] == ["tune"]:
+        sys.exit(run_tune(parse_tune_args(sys.argv[2:])))
+
+    args = parse_args(sys.argv[1:])
+    if args.profile:
+        import profiler
+        profiler.enable(args.profile, torch_ops=args.profile_torch)
+
+    if args.watch:
+        sys.exit(run_watch(args))
+
+    from gui import main
+    main()
@@ -0,0 +1,89 @@
+import pickle
+import numpy as np
+from watermark_mask import WatermarkMask
+
+# Checks for WatermarkMask; run with `python mask_test.py` (pytest also collects the test_* functions)
+
+
+def two_box_array():
+    full = np.zeros((100, 100), dtype=np.uint8)
+    full[10:20, 10:20] = 255
+    full[70:80, 60:70] = 255
+    return full
+
+
+def test_rasterize_rects():
+    mask = WatermarkMask((50, 80), [(10, 20, 19, 29), (40, 30, 44, 34)])
+    full = mask.rasterize()
+    assert full.shape == (50, 80)
+    # Inclusive far corners: 10x10 + 5x5 pixels
+    assert np.count_nonzero(full) == 125 == mask.area()
+    assert full[20, 10] == 255 and full[29, 19] == 255 and full[30, 20] == 0
+    # A window is the same as cropping the full mask
+    window = (5, 15, 42, 33)
+    assert np.array_equal(mask.rasterize(window), full[15:33, 5:42])
+
+
+def test_bbox():
+    mask = WatermarkMask((50, 80), [(10, 20, 19, 29), (40, 30, 44, 34)])
+    assert mask.bbox() == (10, 20, 45, 35)
+    # Clipped to the image
+    assert WatermarkMask((50, 80), [(70, 40, 90, 60)]).bbox() == (70, 40, 80, 50)
+    assert WatermarkMask((50, 80), []).bbox() is None
+
+
+def test_from_array_keeps_pixels():
+    full = two_box_array()
+    mask = WatermarkMask.from_array(full)
+    assert mask.bbox() == (10, 10, 70, 80)
+    # The gap between the two boxes must not become part of the mask
+    assert np.array_equal(mask.to_full(), full)
+    assert mask.area() == 200
+    assert np.array_equal(mask.rasterize((0, 0, 40, 40)), full[:40, :40])
+    assert WatermarkMask.from_array(np.zeros((10, 10), dtype=np.uint8)).bbox() is None
+
+
+def test_round_trips():
+    masks = [
+        WatermarkMask((50, 80), [(10, 20, 19, 29), (40, 30, 44, 34)], confidence=0.5),
+        WatermarkMask.from_array(two_box_array(), confidence=0.25),
+    ]
+    for mask in masks:
+        for copy in (WatermarkMask.from_dict(mask.to_dict()), pickle.loads(pickle.dumps(mask))):
+            assert copy == mask
+            assert copy.confidence == mask.confidence
+            assert np.array_equal(copy.to_full(), mask.to_full())
+
+
+def test_key_equality():
+    a = WatermarkMask((50, 80), [(10, 20, 19, 29), (40, 30, 44, 34)])
+    b = WatermarkMask((50, 80), [(40, 30, 44, 34), (10, 20, 19, 29)])
+    c = WatermarkMask((50, 80), [(10, 20, 19, 30)])
+    assert a.key() == b.key() and a == b and hash(a) == hash(b)
+    assert a != c
+    # Same pixels, whichever way the mask was built
+    assert WatermarkMask.from_array(a.to_full()) == a
+    assert WatermarkMask.from_array(two_box_array()) != WatermarkMask((100, 100), [(10, 10, 69, 79)])
+
+
+def run_tests():
+    print("Starting WatermarkMask checks...")
+    all_passed = True
+    for name, test in list(globals().items()):
+        if not name.startswith("test_"):
+            continue
+        try:
+            test()
+            print(f"  PASS: {name}")
+        except AssertionError as e:
+            print(f"  FAILED: {name} {e}")
+            all_passed = False
+
+    if all_passed:
+        print("\nALL TESTS PASSED.")
+    else:
+        print("\nSOME TESTS FAILED.")
+    return all_passed
+
+if __name__ == "__main__":
+    run_tests()
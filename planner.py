@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import profiler
+import tuning
+from large_image import image_header
+
+# Rough cost model used until a tuning profile provides a measured throughput
+DEFAULT_SECONDS_PER_IMAGE = 1.5
+SECONDS_PER_MEGAPIXEL = 0.02
+# Size of the synthetic image tuning.tune() benchmarks with
+BENCHMARK_MEGAPIXELS = 1600 * 900 / 1e6
+
+
+class PlannedFile:
+    def __init__(self, path, width=0, height=0, fmt=None, nbytes=0, error=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.nbytes = nbytes
+        self.error = error
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+
+def read_header(path):
+    """Header-only inspection of one file: dimensions, format and byte size."""
+    try:
+        nbytes = os.path.getsize(path)
+    except OSError as e:
+        return PlannedFile(path, error=str(e))
+    header = image_header(path)
+    if header is None:
+        # Pillow can't parse it, but cv2 may still decode it: keep it with unknown size
+        return PlannedFile(path, nbytes=nbytes)
+    w, h, fmt = header
+    return PlannedFile(path, w, h, fmt, nbytes)
+
+
+class BatchPlan:
+    """
+    Result of the pre-flight pass: readable files grouped by resolution and
+    ordered largest-first, unreadable files, and a cost/ETA estimate.
+    Only files that can't be stat'ed are unreadable; files whose header Pillow
+    can't parse form a (0, 0) group that is processed last and reported
+    separately as unknown_size.
+    """
+    def __init__(self, files, seconds_per_image):
+        readable = [f for f in files if f.error is None]
+        self.unreadable = [f for f in files if f.error is not None]
+
+        self.groups = {}
+        for f in readable:
+            self.groups.setdefault((f.width, f.height), []).append(f)
+        # Largest resolutions first for load balancing; same-shape work stays contiguous
+        for group in self.groups.values():
+            group.sort(key=lambda f: f.nbytes, reverse=True)
+        self.ordered = [f for size in sorted(self.groups, key=lambda s: s[0] * s[1], reverse=True)
+                        for f in self.groups[size]]
+        self.unknown_size = self.groups.get((0, 0), [])
+
+        self.seconds_per_image = seconds_per_image
+        self.estimates = {f.path: seconds_per_image + SECONDS_PER_MEGAPIXEL * f.pixels / 1e6 for f in self.ordered}
+        self.total_seconds = sum(self.estimates.values())
+        # Running total, so progress updates don't re-sum the whole batch
+        self.remaining = self.total_seconds
+        self.pending = set(self.estimates)
+
+    @property
+    def ordered_paths(self):
+        return [f.path for f in self.ordered]
+
+    def mark_done(self, path):
+        """Subtracts a finished file's estimate from `remaining` (once per file)."""
+        if path in self.pending:
+            self.pending.discard(path)
+            self.remaining = max(0.0, self.remaining - self.estimates[path])
+
+    def summary(self):
+        n_groups = len(self.groups) - (1 if self.unknown_size else 0)
+        n_images = len(self.ordered) - len(self.unknown_size)
+        text = f"{n_images} images in {n_groups} size groups, estimated {format_duration(self.total_seconds)}"
+        if self.unknown_size:
+            text += f", {len(self.unknown_size)} files with unreadable headers (will be attempted)"
+        if self.unreadable:
+            text += f", {len(self.unreadable)} unreadable"
+        return text
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+def estimate_seconds_per_image(profile=None):
+    """Fixed per-image cost, from the tuned throughput when a profile has one."""
+    profile = profile or tuning.load_profile()
+    throughput = (profile.get("benchmark") or {}).get("images_per_s")
+    if throughput:
+        return max(0.0, 1.0 / throughput - SECONDS_PER_MEGAPIXEL * BENCHMARK_MEGAPIXELS)
+    return DEFAULT_SECONDS_PER_IMAGE
+
+
+def plan_batch(paths, workers=8):
+    """Reads only the headers of `paths` in parallel and returns a BatchPlan."""
+    with profiler.span("preflight", files=len(paths)):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preflight") as pool:
+            files = list(pool.map(read_header, paths))
+        return BatchPlan(files, estimate_seconds_per_image())
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+
+# Set to an output path to record a Chrome/Perfetto trace, e.g. GWC_PROFILE=trace.json
+ENV_VAR = "GWC_PROFILE"
+# Set to 1 to also record torch operator-level events for the LaMa forward pass
+TORCH_ENV_VAR = "GWC_PROFILE_TORCH"
+
+
+class TraceRecorder:
+    """
+    Collects spans from every thread and writes them as Chrome trace JSON
+    (open in chrome://tracing or https://ui.perfetto.dev).
+    """
+    def __init__(self, path, torch_ops=False):
+        self.path = path
+        self.torch_ops = torch_ops
+        self.pid = os.getpid()
+        self.events = []
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def now_us(self):
+        return time.perf_counter_ns() / 1000.0
+
+    def name_thread(self, name, tid=None):
+        tid = tid if tid is not None else threading.get_native_id()
+        with self.lock:
+            self.thread_names[tid] = name
+
+    def _ensure_thread_name(self, tid):
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+
+    def add_complete(self, name, start_us, dur_us, cat="app", args=None, tid=None):
+        tid = tid if tid is not None else threading.get_native_id()
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": dur_us, "pid": self.pid, "tid": tid}
+        if args:
+            event["args"] = args
+        with self.lock:
+            self._ensure_thread_name(tid)
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="app", **args):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.add_complete(name, start, self.now_us() - start, cat, args)
+
+    @contextmanager
+    def torch_span(self, name):
+        """Span that also captures torch operator events when torch_ops is on."""
+        if not self.torch_ops:
+            with self.span(name, cat="inference"):
+                yield
+            return
+
+        import torch
+        from torch.profiler import profile, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        start = self.now_us()
+        with profile(activities=activities) as prof:
+            with self.span(name, cat="inference"):
+                yield
+        self._merge_torch_trace(prof, start)
+
+    def _merge_torch_trace(self, prof, start_us):
+        fd, tmp_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            prof.export_chrome_trace(tmp_path)
+            with open(tmp_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Could not export torch trace: {e}")
+            return
+        finally:
+            os.remove(tmp_path)
+
+        torch_events = [e for e in data.get("traceEvents", []) if e.get("ph") == "X" and "ts" in e]
+        if not torch_events:
+            return
+        # torch uses its own clock; align its first event with the start of our span
+        offset = start_us - min(float(e["ts"]) for e in torch_events)
+        tid = threading.get_native_id()
+        with self.lock:
+            for e in torch_events:
+                e["ts"] = float(e["ts"]) + offset
+                e["pid"] = self.pid
+                # Keep GPU kernels on their own track, CPU ops on the calling thread
+                if e.get("cat") not in ("kernel", "gpu_memcpy", "gpu_memset"):
+                    e["tid"] = tid
+                self.events.append(e)
+
+    def save(self):
+        with self.lock:
+            events = list(self.events)
+            names = dict(self.thread_names)
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in names.items()
+        ]
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+            print(f"Profile trace written to {self.path} ({len(events)} events)")
+        except Exception as e:
+            print(f"Could not write profile trace {self.path}: {e}")
+
+
+_recorder = None
+
+
+def enable(path, torch_ops=False):
+    """Starts recording; the trace is written at interpreter exit (or on save())."""
+    global _recorder
+    first = _recorder is None
+    _recorder = TraceRecorder(path, torch_ops=torch_ops)
+    _recorder.name_thread("MainThread")
+    if first:
+        atexit.register(save)
+    return _recorder
+
+
+def enable_from_env():
+    path = os.environ.get(ENV_VAR)
+    if path:
+        enable(path, torch_ops=os.environ.get(TORCH_ENV_VAR, "") not in ("", "0"))
+
+
+def is_enabled():
+    return _recorder is not None
+
+
+def span(name, cat="app", **args):
+    """Context manager recording a span on the current thread; no-op when disabled."""
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.span(name, cat, **args)
+
+
+def torch_span(name):
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.torch_span(name)
+
+
+def traced(name, fn, cat="app"):
+    """Wraps fn so each call is recorded as a span (useful for executor jobs)."""
+    def wrapper(*args, **kwargs):
+        with span(name, cat):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def name_thread(name):
+    """Labels the current thread in the trace (QThreads have no useful Python name)."""
+    if _recorder is not None:
+        _recorder.name_thread(name)
+
+
+def save():
+    if _recorder is not None:
+        _recorder.save()
+
+
+enable_from_env()
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import queue
+import threading
+import profiler
+
+VALID_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+class ProcessedIndex:
+    """
+    Persistent record of finished files: path -> (size, mtime_ns).
+    A file is considered done as long as its size and mtime are unchanged.
+    Failed files are recorded the same way, so they are only retried once they
+    change on disk. Writes are batched: save_if_due() only rewrites the JSON every
+    `save_every` changes or `save_interval` seconds; flush() writes pending changes.
+    """
+    def __init__(self, path, save_every=50, save_interval=10.0):
+        self.path = path
+        self.entries = {}
+        self.failed = {}
+        self.lock = threading.Lock()
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.dirty = 0
+        self.last_save = time.monotonic()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if "done" not in data:
+                # Index written before failures were recorded: path -> signature
+                data = {"done": data}
+            self.entries = {k: tuple(v) for k, v in data["done"].items()}
+            self.failed = {k: tuple(v) for k, v in data.get("failed", {}).items()}
+        except Exception as e:
+            print(f"Could not read index {self.path}: {e}")
+            self.entries = {}
+            self.failed = {}
+
+    def save(self):
+        with self.lock:
+            data = {"done": dict(self.entries), "failed": dict(self.failed)}
+            self.dirty = 0
+            self.last_save = time.monotonic()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Could not write index {self.path}: {e}")
+
+    def save_if_due(self):
+        with self.lock:
+            due = self.dirty >= self.save_every or (
+                self.dirty and time.monotonic() - self.last_save >= self.save_interval
+            )
+        if due:
+            self.save()
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def is_done(self, path, signature):
+        with self.lock:
+            return self.entries.get(path) == signature
+
+    def has_failed(self, path, signature):
+        with self.lock:
+            return self.failed.get(path) == signature
+
+    def mark_done(self, path, signature):
+        with self.lock:
+            self.entries[path] = signature
+            self.failed.pop(path, None)
+            self.dirty += 1
+
+    def mark_failed(self, path, signature):
+        with self.lock:
+            self.failed[path] = signature
+            self.dirty += 1
+
+
+class FolderWatcher:
+    """
+    Polls input folders with os.scandir and feeds new or changed images to a warm
+    WatermarkRemover. A file is picked up once its size and mtime have been stable
+    for `settle_time` seconds, so half-written files are never processed.
+    """
+    def __init__(self, remover, input_dirs, output_dir, threshold=100, dilation=3.0,
+                 roi_ratio=(0.3, 0.15), recursive=False, poll_interval=1.0,
+                 settle_time=2.0, queue_size=16, index_path=None):
+        self.remover = remover
+        self.input_dirs = [os.path.abspath(d) for d in input_dirs]
+        self.output_dir = os.path.abspath(output_dir)
+        self.output_roots = self.assign_output_roots()
+        self.threshold = threshold
+        self.dilation = dilation
+        self.roi_ratio = roi_ratio
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+
+        if index_path is None:
+            index_path = os.path.join(self.output_dir, ".watch_index.json")
+        self.index = ProcessedIndex(index_path)
+
+        # path -> (signature, time the signature was first seen)
+        self.candidates = {}
+        self.queued = set()
+        self.queued_lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.is_running = True
+        self.worker_thread = None
+
+    def iter_images(self, folder):
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and os.path.abspath(entry.path) != self.output_dir:
+                            yield from self.iter_images(entry.path)
+                    elif entry.name.lower().endswith(VALID_EXTS):
+                        yield entry
+        except OSError as e:
+            print(f"Could not scan {folder}: {e}")
+
+    def scan(self):
+        """One polling pass. Returns the number of files queued."""
+        with profiler.span("watch_scan"):
+            return self._scan()
+
+    def _scan(self):
+        now = time.monotonic()
+        seen = set()
+        queued = 0
+
+        for input_dir in self.input_dirs:
+            for entry in self.iter_images(input_dir):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                path = entry.path
+                signature = (st.st_size, st.st_mtime_ns)
+                seen.add(path)
+
+                if self.index.is_done(path, signature) or self.index.has_failed(path, signature):
+                    # Failed files wait until they change on disk
+                    self.candidates.pop(path, None)
+                    continue
+                with self.queued_lock:
+                    if path in self.queued:
+                        continue
+
+                previous = self.candidates.get(path)
+                if previous is None or previous[0] != signature:
+                    # New or still being written: restart the settle timer
+                    self.candidates[path] = (signature, now)
+                    continue
+                if now - previous[1] < self.settle_time:
+                    continue
+
+                try:
+                    self.queue.put_nowait((input_dir, path, signature))
+                except queue.Full:
+                    # Back-pressure: leave it as a candidate and retry next poll
+                    continue
+                with self.queued_lock:
+                    self.queued.add(path)
+                del self.candidates[path]
+                queued += 1
+
+        # Forget files that disappeared before settling
+        for path in list(self.candidates):
+            if path not in seen:
+                del self.candidates[path]
+
+        return queued
+
+    def assign_output_roots(self):
+        """
+        Output folder per input dir: the output dir itself for a single input dir,
+        otherwise a subfolder named after each input dir (numbered if two share a
+        name), so a/x.png and b/x.png can't overwrite each other.
+        """
+        if len(self.input_dirs) == 1:
+            return {self.input_dirs[0]: self.output_dir}
+        roots = {}
+        used = set()
+        for i, input_dir in enumerate(self.input_dirs):
+            name = os.path.basename(input_dir.rstrip(os.sep)) or f"input{i}"
+            base, n = name, 1
+            while os.path.normcase(name) in used:
+                n += 1
+                name = f"{base}_{n}"
+            used.add(os.path.normcase(name))
+            roots[input_dir] = os.path.join(self.output_dir, name)
+        return roots
+
+    def output_path_for(self, input_dir, path):
+        return os.path.join(self.output_roots[input_dir], os.path.relpath(path, input_dir))
+
+    def process_next(self, timeout=0.5):
+        try:
+            input_dir, path, signature = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+        success = False
+        try:
+            output_path = self.output_path_for(input_dir, path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            success = self.remover.process_image(
+                path,
+                output_path,
+                threshold=self.threshold,
+                dilation_iter=self.dilation,
+                roi_ratio=self.roi_ratio
+            )
+        except Exception as e:
+            print(f"Error processing {os.path.basename(path)}: {e}")
+        finally:
+            if success:
+                self.index.mark_done(path, signature)
+            else:
+                print(f"Failed: {path} (retried once the file changes)")
+                self.index.mark_failed(path, signature)
+            self.index.save_if_due()
+            with self.queued_lock:
+                self.queued.discard(path)
+            self.queue.task_done()
+        return True
+
+    def worker_loop(self):
+        while self.is_running:
+            if not self.process_next():
+                # Idle: write out whatever the batched saves are still holding
+                self.index.flush()
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self.worker_loop, name="WatchWorker", daemon=True)
+        self.worker_thread.start()
+
+    def run_forever(self):
+        self.start()
+        print(f"Watching {', '.join(self.input_dirs)} -> {self.output_dir} (Ctrl+C to stop)")
+        try:
+            while self.is_running:
+                self.scan()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("Stopping watcher...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.is_running = False
+        if self.worker_thread is not None:
+            self.worker_thread.join()
+            self.worker_thread = None
+        self.index.save()
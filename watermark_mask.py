@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import numpy as np
+
+
+class WatermarkMask:
+    """
+    Compact detection result: the filled rectangles (inclusive pixel corners, image
+    coordinates), an ROI-local bitmap covering just their bounding box, and a
+    confidence score in [0, 1] (0 means the default fallback box was used).
+    Full-frame masks are only produced on request via rasterize().
+    Masks built from pixels (from_array) keep those exact pixels as their bitmap;
+    their single rectangle is then only the bitmap's bounding box.
+    """
+    def __init__(self, image_shape, rects, confidence=1.0, bitmap=None, offset=(0, 0)):
+        self.shape = tuple(image_shape[:2])
+        self.rects = [tuple(int(v) for v in r) for r in rects]
+        self.confidence = float(confidence)
+        self.from_pixels = bitmap is not None
+        if self.from_pixels:
+            self.offset = tuple(int(v) for v in offset)
+            self.bitmap = np.where(np.asarray(bitmap) > 0, 255, 0).astype(np.uint8)
+        else:
+            self.offset, self.bitmap = self._build_bitmap()
+
+    @classmethod
+    def from_array(cls, mask, confidence=1.0):
+        """Wraps a full-frame mask (non-zero = masked), keeping its exact pixels."""
+        mask = np.asarray(mask)
+        if mask.ndim == 3:
+            mask = mask.max(axis=2)
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if not len(rows):
+            return cls(mask.shape, [], confidence)
+        x1, x2 = int(cols[0]), int(cols[-1])
+        y1, y2 = int(rows[0]), int(rows[-1])
+        return cls(mask.shape, [(x1, y1, x2, y2)], confidence,
+                   bitmap=mask[y1:y2 + 1, x1:x2 + 1], offset=(x1, y1))
+
+    def _build_bitmap(self):
+        box = self.bbox()
+        if box is None:
+            return (0, 0), np.zeros((0, 0), dtype=np.uint8)
+        bx1, by1, bx2, by2 = box
+        bitmap = np.zeros((by2 - by1, bx2 - bx1), dtype=np.uint8)
+        for rx1, ry1, rx2, ry2 in self.rects:
+            # Rectangles are inclusive of their far corner, like cv2.rectangle
+            x1, y1 = max(rx1, bx1), max(ry1, by1)
+            x2, y2 = min(rx2 + 1, bx2), min(ry2 + 1, by2)
+            if x2 > x1 and y2 > y1:
+                bitmap[y1 - by1:y2 - by1, x1 - bx1:x2 - bx1] = 255
+        return (bx1, by1), bitmap
+
+    def bbox(self):
+        """(x1, y1, x2, y2) with exclusive x2/y2, clipped to the image, or None if empty."""
+        if not self.rects:
+            return None
+        h, w = self.shape
+        x1 = max(0, min(r[0] for r in self.rects))
+        y1 = max(0, min(r[1] for r in self.rects))
+        x2 = min(w, max(r[2] for r in self.rects) + 1)
+        y2 = min(h, max(r[3] for r in self.rects) + 1)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def rasterize(self, window=None):
+        """uint8 mask (0/255) of the window (x1, y1, x2, y2); whole image by default."""
+        h, w = self.shape
+        wx1, wy1, wx2, wy2 = window if window is not None else (0, 0, w, h)
+        out = np.zeros((wy2 - wy1, wx2 - wx1), dtype=np.uint8)
+        ox, oy = self.offset
+        bh, bw = self.bitmap.shape
+        x1, y1 = max(ox, wx1), max(oy, wy1)
+        x2, y2 = min(ox + bw, wx2), min(oy + bh, wy2)
+        if x2 > x1 and y2 > y1:
+            out[y1 - wy1:y2 - wy1, x1 - wx1:x2 - wx1] = self.bitmap[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+        return out
+
+    def to_full(self):
+        return self.rasterize()
+
+    def area(self):
+        return int(np.count_nonzero(self.bitmap))
+
+    def key(self):
+        """Hashable value that is equal for identical masks."""
+        digest = hashlib.blake2b(np.ascontiguousarray(self.bitmap).tobytes(), digest_size=16).digest()
+        return self.shape, self.offset, self.bitmap.shape, digest
+
+    def to_dict(self):
+        """JSON-friendly form; rectangle masks rebuild their bitmap from the rectangles on load."""
+        data = {
+            "shape": list(self.shape),
+            "rects": [list(r) for r in self.rects],
+            "confidence": self.confidence,
+        }
+        if self.from_pixels:
+            data["offset"] = list(self.offset)
+            data["bitmap_shape"] = list(self.bitmap.shape)
+            data["bitmap"] = base64.b64encode(np.packbits(self.bitmap > 0).tobytes()).decode("ascii")
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        bitmap = None
+        if "bitmap" in data:
+            bh, bw = data["bitmap_shape"]
+            packed = np.frombuffer(base64.b64decode(data["bitmap"]), dtype=np.uint8)
+            bitmap = np.unpackbits(packed, count=bh * bw).reshape(bh, bw)
+        return cls(data["shape"], data["rects"], data.get("confidence", 1.0),
+                   bitmap=bitmap, offset=data.get("offset", (0, 0)))
+
+    def __reduce__(self):
+        # Pickle (multiprocessing, caches) as rectangles, plus the packed bitmap if any
+        return (WatermarkMask.from_dict, (self.to_dict(),))
+
+    def __eq__(self, other):
+        return isinstance(other, WatermarkMask) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"WatermarkMask(shape={self.shape}, rects={len(self.rects)}, confidence={self.confidence:.2f})"
@@ -5,31 +5,61 @@ from PIL import Image
 from iopaint.model import LaMa
 from iopaint.schema import InpaintRequest
 import os
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import profiler
+from large_image import image_header, process_large_image
+from watermark_mask import WatermarkMask
+import tuning
 
 class WatermarkRemover:
-    def __init__(self, device='cpu'):
-        if torch.cuda.is_available():
+    def __init__(self, device=None, io_workers=None, inference_long_side=768, context_margin=64, feather=2,
+                 large_image_pixels=40_000_000, use_profile=True):
+        # Hardware profile written by `main.py tune`; explicit arguments win
+        profile = tuning.load_profile() if use_profile else dict(tuning.DEFAULT_PROFILE)
+        tuning.apply_torch_threads(profile["torch_threads"])
+        # Images in flight for pipelined batch runs
+        self.concurrency = max(1, int(profile["concurrency"]))
+
+        # Inference-scale policy: LaMa only sees the context window around the mask,
+        # downscaled so its long side is at most inference_long_side (None = full res).
+        self.inference_long_side = inference_long_side
+        self.context_margin = context_margin
+        self.feather = feather
+        # Images with at least this many pixels go through the bounded-memory path (None = never)
+        self.large_image_pixels = large_image_pixels
+
+        # Executors for the asyncio API, created on first use
+        self.io_workers = io_workers or profile["io_workers"]
+        self._io_executor = None
+        self._inference_executor = None
+        self._executor_lock = threading.Lock()
+
+        device = device or profile["device"]
+        if device == 'cuda' and not torch.cuda.is_available():
+            device = None
+        if device:
+            self.device = device
+        elif torch.cuda.is_available():
             self.device = 'cuda'
         else:
             self.device = 'cpu'
         
         print(f"Initializing LaMa model on {self.device}...")
         try:
-            self.model = LaMa(device=self.device)
+            with profiler.span("load_model", device=self.device):
+                self.model = LaMa(device=self.device)
         except Exception as e:
             print(f"Error initializing model: {e}")
             self.model = None
 
-    def detect_watermark(self, image_cv2, canny_threshold=100, dilation_width=3.0, roi_ratio=(0.3, 0.15)):
+    def roi_box(self, h, w, roi_ratio=(0.3, 0.15)):
         """
-        Automatically detects watermark in corners.
-        canny_threshold: Threshold for edge detection (sensitivity).
-        dilation_width: Width of the horizontal dilation kernel (expansion).
-        roi_ratio: Tuple (width_pct, height_percent) defining the search box anchored at Bottom-Right.
+        Returns (x, y, w_margin, h_margin): the search box anchored at Bottom-Right,
+        in pixels of an h x w image.
         """
-        h, w = image_cv2.shape[:2]
-        mask = np.zeros((h, w), dtype=np.uint8)
-        
         # ROI Dimensions relative to bottom-right
         r_w, r_h = roi_ratio
         # Fallback if 0
@@ -43,16 +73,43 @@ class WatermarkRemover:
         w_margin = max(10, min(w, w_margin))
         h_margin = max(10, min(h, h_margin))
         
-        # Bottom Right ROI
         # Coords: y from h-h_margin to h, x from w-w_margin to w
-        br_roi = image_cv2[h-h_margin:h, w-w_margin:w]
-        
-        def get_edges(roi, thresh):
-            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, thresh, thresh * 2.5)
-            return edges
+        return w - w_margin, h - h_margin, w_margin, h_margin
+
+    def roi_gray(self, image_cv2, roi_ratio=(0.3, 0.15)):
+        """Crops the Bottom-Right ROI and converts it to grayscale."""
+        h, w = image_cv2.shape[:2]
+        x, y, _, _ = self.roi_box(h, w, roi_ratio)
+        return cv2.cvtColor(image_cv2[y:h, x:w], cv2.COLOR_BGR2GRAY)
 
-        br_edges = get_edges(br_roi, canny_threshold)
+    def roi_edges(self, roi_gray, canny_threshold=100):
+        return cv2.Canny(roi_gray, canny_threshold, canny_threshold * 2.5)
+
+    def locate_watermark(self, image_cv2, canny_threshold=100, dilation_width=3.0, roi_ratio=(0.3, 0.15)):
+        """
+        Automatically detects watermark in corners.
+        canny_threshold: Threshold for edge detection (sensitivity).
+        dilation_width: Width of the horizontal dilation kernel (expansion).
+        roi_ratio: Tuple (width_pct, height_percent) defining the search box anchored at Bottom-Right.
+        Returns a compact WatermarkMask (rectangles + ROI-local bitmap + confidence).
+        """
+        with profiler.span("detect_watermark"):
+            h, w = image_cv2.shape[:2]
+            br_edges = self.roi_edges(self.roi_gray(image_cv2, roi_ratio), canny_threshold)
+            return self.locate_from_edges(br_edges, (h, w), self.roi_box(h, w, roi_ratio), dilation_width)
+
+    def detect_watermark(self, image_cv2, canny_threshold=100, dilation_width=3.0, roi_ratio=(0.3, 0.15)):
+        """Full-frame uint8 mask version of locate_watermark, for callers that need one."""
+        return self.locate_watermark(image_cv2, canny_threshold, dilation_width, roi_ratio).to_full()
+
+    def locate_from_edges(self, br_edges, image_shape, roi_box, dilation_width=3.0):
+        """
+        Builds the WatermarkMask from the Canny edges of the Bottom-Right ROI.
+        Split from locate_watermark so cached edges can be re-used with new dilation.
+        """
+        h, w = image_shape[:2]
+        roi_x, roi_y, w_margin, h_margin = roi_box
+        rects = []
         
         # Dilation settings
         k_w = max(1, int(round(dilation_width)))
@@ -66,7 +123,7 @@ class WatermarkRemover:
             
             contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
-            found_any = False
+            edge_hits = 0
             
             for cnt in contours:
                 x, y, bw, bh = cv2.boundingRect(cnt)
@@ -76,7 +133,7 @@ class WatermarkRemover:
                 if bw > (w_margin * 0.9): continue 
                 if bh > bw * 2: continue
 
-                found_any = True
+                edge_hits += np.count_nonzero(roi_edges[y:y+bh, x:x+bw])
                 pad = 2
                 
                 g_x1 = roi_x_offset + x - pad
@@ -89,62 +146,292 @@ class WatermarkRemover:
                 g_x2 = min(w, g_x2)
                 g_y2 = min(h, g_y2)
                 
-                cv2.rectangle(mask, (g_x1, g_y1), (g_x2, g_y2), 255, -1)
+                # Inclusive corners, as cv2.rectangle used to draw them
+                rects.append((g_x1, g_y1, g_x2, g_y2))
             
-            return found_any
+            return edge_hits
 
-        found_mask = False
+        confidence = 0.0
         min_pixel_trigger = 10 
         
         br_score = np.count_nonzero(br_edges)
         
         if br_score > min_pixel_trigger:
             # Offset is Top-Left of ROI in Global Image
-            if process_roi(br_edges, w - w_margin, h - h_margin):
-                found_mask = True
+            edge_hits = process_roi(br_edges, roi_x, roi_y)
+            # Share of the ROI's edges explained by the accepted boxes
+            confidence = min(1.0, edge_hits / float(br_score))
         
         # Note: Bottom-Left detection is disabled as user requested "Only process inside red box" 
         # and the red box is explicitly "Bottom-Right anchored".
         
         # Fallback
-        if not found_mask:
+        if not rects:
             print("No clear watermark detected. Applying default small mask.")
             box_w = min(200, w_margin)
             box_h = min(50, h_margin)
-            cv2.rectangle(mask, (w-box_w, h-box_h), (w, h), 255, -1)
+            rects.append((w-box_w, h-box_h, w, h))
+            confidence = 0.0
             
-        return mask
+        return WatermarkMask((h, w), rects, confidence)
 
     def process_image(self, input_path, output_path, threshold=100, dilation_iter=3.0, roi_ratio=(0.3, 0.15)):
         if not self.model:
             print("Model not loaded.")
             return False
 
-        img = cv2.imread(input_path)
+        if self.is_large_image(input_path):
+            return process_large_image(self, input_path, output_path, threshold, dilation_iter, roi_ratio)
+
+        with profiler.span("decode", path=input_path):
+            img = cv2.imread(input_path)
         if img is None:
             print(f"Could not load image: {input_path}")
             return False
-            
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        mask = self.detect_watermark(
-            img, 
-            canny_threshold=threshold, 
+
+        res_bgr, _ = self.remove_watermark(img, threshold, dilation_iter, roi_ratio)
+        if res_bgr is None:
+            return False
+
+        try:
+            with profiler.span("encode", path=output_path):
+                cv2.imwrite(output_path, res_bgr)
+            print(f"Processed: {input_path} -> {output_path}")
+            return True
+        except Exception as e:
+            print(f"Could not save image: {e}")
+            return False
+
+    def is_large_image(self, input_path):
+        """Header-only check whether an image should take the bounded-memory path."""
+        if not self.large_image_pixels:
+            return False
+        header = image_header(input_path)
+        return header is not None and header[0] * header[1] >= self.large_image_pixels
+
+    def remove_watermark(self, img, threshold=100, dilation_iter=3.0, roi_ratio=(0.3, 0.15)):
+        """
+        Detects and inpaints the watermark of an already decoded BGR image.
+        Returns (result_bgr, mask), mask being a WatermarkMask. result_bgr is None
+        if inpainting failed.
+        """
+        mask = self.locate_watermark(
+            img,
+            canny_threshold=threshold,
             dilation_width=dilation_iter,
             roi_ratio=roi_ratio
         )
-        
+        return self.inpaint(img, mask), mask
+
+    def context_window(self, mask):
+        """
+        Returns (x1, y1, x2, y2): the mask's bounding box grown by enough context for
+        LaMa (at least context_margin, or the box's own long side), or None if empty.
+        """
+        h, w = mask.shape[:2]
+        box = mask.bbox()
+        if box is None:
+            return None
+        x, y = box[0], box[1]
+        bw, bh = box[2] - x, box[3] - y
+        margin = max(self.context_margin, bw, bh)
+        return max(0, x - margin), max(0, y - margin), min(w, x + bw + margin), min(h, y + bh + margin)
+
+    def inpaint(self, img, mask):
+        """
+        Runs LaMa on a BGR image and mask (WatermarkMask, or a full-frame uint8 mask).
+        Returns the BGR result or None.
+        Only the context window around the mask is inpainted, downscaled to the
+        inference_long_side cap if needed. The result is composited back inside the
+        mask only (feathered at its inner edge), so pixels outside the mask are
+        bit-exact copies of the input.
+        """
+        if not self.model:
+            print("Model not loaded.")
+            return None
+
+        if not isinstance(mask, WatermarkMask):
+            mask = self.mask_from_array(mask)
+
+        with profiler.span("inpaint"):
+            window = self.context_window(mask)
+            if window is None:
+                return img.copy()
+            x1, y1, x2, y2 = window
+            patch = self._inpaint_crop(img[y1:y2, x1:x2], mask, window)
+            if patch is None:
+                return None
+            out = img.copy()
+            out[y1:y2, x1:x2] = patch
+            return out
+
+    def inpaint_window(self, crop, mask, window):
+        """
+        Like inpaint, for callers that never hold the full frame: `crop` holds the
+        pixels of `window` (x1, y1, x2, y2, normally context_window(mask)) and only
+        the patched crop is returned, or None.
+        """
+        if not self.model:
+            print("Model not loaded.")
+            return None
+
+        with profiler.span("inpaint"):
+            return self._inpaint_crop(crop, mask, window)
+
+    def mask_from_array(self, mask):
+        """Wraps a full-frame uint8 mask as a WatermarkMask, keeping its exact pixels."""
+        return WatermarkMask.from_array(mask)
+
+    def _inpaint_crop(self, crop, mask, window):
+        # Only the context window is ever rasterized
+        crop_mask = mask.rasterize(window)
+        ch, cw = crop_mask.shape[:2]
+
+        scale = 1.0
+        if self.inference_long_side:
+            scale = min(1.0, self.inference_long_side / max(ch, cw))
+
+        if scale < 1.0:
+            size = (max(1, int(round(cw * scale))), max(1, int(round(ch * scale))))
+            small = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+            # Any partially covered pixel stays masked so nothing of the logo survives
+            small_mask = np.where(cv2.resize(crop_mask, size, interpolation=cv2.INTER_AREA) > 0, 255, 0).astype(np.uint8)
+            res_small = self._run_model(small, small_mask)
+            if res_small is None:
+                return None
+            res_crop = cv2.resize(res_small, (cw, ch), interpolation=cv2.INTER_CUBIC)
+        else:
+            res_crop = self._run_model(crop, crop_mask)
+            if res_crop is None:
+                return None
+
+        # Feather inside the mask: alpha ramps from the mask edge to 1 over `feather` px
+        inside = (crop_mask > 0).astype(np.uint8)
+        if self.feather > 0:
+            dist = cv2.distanceTransform(inside, cv2.DIST_L2, 3)
+            alpha = np.clip(dist / float(self.feather), 0.0, 1.0)
+        else:
+            alpha = inside.astype(np.float32)
+        alpha = alpha[:, :, None]
+
+        blended = res_crop.astype(np.float32) * alpha + crop.astype(np.float32) * (1.0 - alpha)
+        patch = crop.copy()
+        np.copyto(patch, np.clip(blended + 0.5, 0, 255).astype(np.uint8), where=inside[:, :, None] > 0)
+        return patch
+
+    def _run_model(self, img, mask):
+        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         config = InpaintRequest()
-        
+
         try:
-            res_bgr = self.model(img_rgb, mask, config)
-            cv2.imwrite(output_path, res_bgr)
-            print(f"Processed: {input_path} -> {output_path}")
-            return True
+            # LaMa returns BGR
+            with profiler.torch_span("lama_forward"):
+                return self.model(img_rgb, mask, config)
         except Exception as e:
             print(f"Inpainting failed: {e}")
+            return None
+
+    def _executors(self):
+        with self._executor_lock:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="remover-io")
+            if self._inference_executor is None:
+                # One thread owns the model so concurrent requests queue instead of contending
+                self._inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="remover-inference")
+            return self._io_executor, self._inference_executor
+
+    async def aprocess(self, input_path, output_path, threshold=100, dilation_iter=3.0, roi_ratio=(0.3, 0.15)):
+        """
+        Async version of process_image for asyncio services.
+        Decode, detection and encode run on an I/O thread pool, LaMa on a dedicated
+        inference thread, so the event loop is never blocked. Cancelling the task
+        before inference starts skips the inference entirely.
+        """
+        if not self.model:
+            print("Model not loaded.")
             return False
 
+        loop = asyncio.get_running_loop()
+        io_executor, inference_executor = self._executors()
+
+        if await loop.run_in_executor(io_executor, self.is_large_image, input_path):
+            # Band decode, inference and streamed encode all stay on the inference thread
+            return await loop.run_in_executor(inference_executor, partial(
+                process_large_image, self, input_path, output_path, threshold, dilation_iter, roi_ratio
+            ))
+
+        img = await loop.run_in_executor(io_executor, profiler.traced("decode", cv2.imread), input_path)
+        if img is None:
+            print(f"Could not load image: {input_path}")
+            return False
+
+        mask = await loop.run_in_executor(io_executor, partial(
+            self.locate_watermark,
+            img,
+            canny_threshold=threshold,
+            dilation_width=dilation_iter,
+            roi_ratio=roi_ratio
+        ))
+
+        res_bgr = await loop.run_in_executor(inference_executor, self.inpaint, img, mask)
+        if res_bgr is None:
+            return False
+
+        if not await loop.run_in_executor(io_executor, profiler.traced("encode", cv2.imwrite), output_path, res_bgr):
+            print(f"Could not save image: {output_path}")
+            return False
+        print(f"Processed: {input_path} -> {output_path}")
+        return True
+
+    async def aprocess_many(self, jobs, concurrency=4, threshold=100, dilation_iter=3.0, roi_ratio=(0.3, 0.15)):
+        """
+        Processes (input_path, output_path) pairs with at most `concurrency` in flight.
+        Async generator yielding (input_path, output_path, success) in completion order.
+        Closing the generator or cancelling the consumer cancels outstanding work.
+        """
+        jobs = iter(jobs)
+        pending = {}
+
+        def submit_next():
+            job = next(jobs, None)
+            if job is None:
+                return False
+            input_path, output_path = job
+            task = asyncio.ensure_future(self.aprocess(input_path, output_path, threshold, dilation_iter, roi_ratio))
+            pending[task] = job
+            return True
+
+        try:
+            while len(pending) < concurrency and submit_next():
+                pass
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    input_path, output_path = pending.pop(task)
+                    try:
+                        success = task.result()
+                    except Exception as e:
+                        print(f"Error processing {os.path.basename(input_path)}: {e}")
+                        success = False
+                    # Refill before yielding so the pipeline stays busy while the consumer works
+                    submit_next()
+                    yield input_path, output_path, success
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def close(self):
+        """Shuts down the executors used by the asyncio API."""
+        with self._executor_lock:
+            for executor in (self._io_executor, self._inference_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._io_executor = None
+            self._inference_executor = None
+
 if __name__ == "__main__":
     # Test
     remover = WatermarkRemover()